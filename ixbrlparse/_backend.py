@@ -0,0 +1,258 @@
+"""
+The XML libraries that documents can be read with.
+
+lxml is used where it is installed. Otherwise documents are read with the
+ElementTree module from the standard library, which is slower and cannot
+recover from badly formed markup.
+"""
+import re
+import xml.etree.ElementTree as ElementTree
+from functools import lru_cache
+from itertools import chain
+from weakref import WeakKeyDictionary
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover
+    etree = None
+
+XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+EVENTS = ("start-ns", "start", "end")
+CHUNK_SIZE = 64 * 1024
+# the encoding given in an XML declaration at the start of a document
+DECLARED_ENCODING = re.compile(
+    r"""\A(\ufeff?\s*<\?xml\b[^>]*?\sencoding\s*=\s*)(["'])[^"']*\2"""
+)
+
+
+def localname(tag):
+    return tag.rpartition("}")[2]
+
+
+def get_text(elem):
+    # most elements only contain text, which can be used without walking
+    # through the element's children
+    if len(elem) == 0:
+        return elem.text or ""
+    return "".join(elem.itertext())
+
+
+def _read_chunks(f, chunk_size=CHUNK_SIZE):
+    chunk = f.read(chunk_size)
+    while chunk:
+        yield chunk
+        chunk = f.read(chunk_size)
+
+
+class ElementTreeBackend:
+    name = "etree"
+
+    def __init__(self):
+        # namespace prefixes aren't kept in the tree, so they are recorded
+        # from the parser's start-ns events
+        self._prefixes = {}
+        self._declared = WeakKeyDictionary()
+        self._open_elements = []
+
+    def _get_pull_parser(self, is_text, events=EVENTS, tags=None):
+        return ElementTree.XMLPullParser(events=events)
+
+    def _feed(self, parser, chunk):
+        parser.feed(chunk)
+
+    def read_root(self, f):
+        """
+        Find the local name of the root element of the document in `f`.
+
+        Returns the name along with the chunks of the whole document, including
+        the ones that had to be read to find the root element.
+        """
+        chunks = _read_chunks(f)
+        read = []
+        parser = None
+        for chunk in chunks:
+            if parser is None:
+                parser = self._get_pull_parser(isinstance(chunk, str), ("start",))
+            read.append(chunk)
+            self._feed(parser, chunk)
+            for _, elem in parser.read_events():
+                return localname(elem.tag), chain(read, chunks)
+        return None, iter(read)
+
+    def iterparse(self, chunks, tags=None):
+        """
+        Yield `("start", element)` and `("end", element)` pairs as the
+        document is read.
+
+        If `tags` is given then a backend may skip the events for elements
+        without those local names, although they are still added to the tree.
+        """
+        parser = None
+        namespaces = []
+        for chunk in chain(chunks, [None]):
+            if chunk is not None:
+                if parser is None:
+                    parser = self._get_pull_parser(isinstance(chunk, str), tags=tags)
+                self._feed(parser, chunk)
+            elif parser is not None:
+                parser.close()
+            else:
+                return
+            for event, elem in parser.read_events():
+                if event == "start-ns":
+                    namespaces.append(elem)
+                    self._prefixes.setdefault(elem[1], elem[0])
+                    continue
+                if event == "start":
+                    if namespaces:
+                        self._declare(elem, namespaces)
+                        namespaces = []
+                    yield event, elem
+                    self._open_elements.append(elem)
+                else:
+                    self._open_elements.pop()
+                    yield event, elem
+
+    def _declare(self, elem, namespaces):
+        self._declared[elem] = namespaces
+
+    def discard(self, elem):
+        """
+        Remove an element from the tree once it is no longer needed.
+        """
+        # ElementTree has finished with the element by the time its end event
+        # is returned, so it can be taken out of its parent straight away
+        elem.clear()
+        if self._open_elements:
+            self._open_elements[-1].remove(elem)
+
+    def get_namespaces(self, elem):
+        """
+        Get the namespaces declared on an element as `(prefix, uri)` pairs,
+        using a prefix of `""` for the default namespace.
+        """
+        return self._declared.get(elem, [])
+
+    def get_attrs(self, elem):
+        """
+        Get the attributes of an element, with any namespaced attributes named
+        using the prefix for their namespace (eg `xlink:href`).
+        """
+        attrs = {}
+        for k, v in elem.attrib.items():
+            if k[0] == "{":
+                namespace, _, name = k[1:].partition("}")
+                if namespace == XML_NAMESPACE:
+                    k = "xml:{}".format(name)
+                elif namespace in self._prefixes:
+                    k = "{}:{}".format(self._prefixes[namespace], name)
+                else:
+                    k = name
+            attrs[k] = v
+        return attrs
+
+    def iter_tag(self, elem, *local_names):
+        """
+        Iterate through the descendants of `elem` with any of the given local
+        names, or all of its descendants if no names are given.
+        """
+        for e in elem.iter():
+            if e is not elem and (not local_names or localname(e.tag) in local_names):
+                yield e
+
+    def find_first(self, elem, *local_names):
+        return next(self.iter_tag(elem, *local_names), None)
+
+    def find_each(self, elem, *local_names):
+        """
+        Find the first descendant of `elem` with each of the given local names
+        in a single pass, returned as a dict keyed by local name.
+        """
+        found = {}
+        for e in self.iter_tag(elem, *local_names):
+            found.setdefault(localname(e.tag), e)
+        return found
+
+
+class LxmlBackend(ElementTreeBackend):
+    name = "lxml"
+
+    def _get_pull_parser(self, is_text, events=EVENTS, tags=None):
+        # text has already been decoded, so it is re-encoded as UTF-8
+        return etree.XMLPullParser(
+            events=events,
+            # elements without these tags are still parsed, but lxml doesn't
+            # return their events so they are never handled in python
+            tag=_wildcard_tags(tuple(tags)) if tags else None,
+            huge_tree=True,
+            recover=True,
+            # ids are looked up through the contexts and units instead
+            collect_ids=False,
+            encoding="utf-8" if is_text else None,
+        )
+
+    def _feed(self, parser, chunk):
+        if isinstance(chunk, str):
+            # lxml would still use the encoding declared in the document, so
+            # the declaration is changed to match the re-encoded text
+            chunk = DECLARED_ENCODING.sub(r"\1\2utf-8\2", chunk, count=1)
+            chunk = chunk.encode("utf-8")
+        parser.feed(chunk)
+
+    def _declare(self, elem, namespaces):
+        # start-ns events are still returned for elements that are skipped by
+        # the tag filter, so the declarations are read from the tree instead
+        pass
+
+    def discard(self, elem):
+        # The element itself is only cleared. libxml2 is still building the
+        # tree and will add the element's tail text to it, so removing it here
+        # would leave libxml2 writing to a detached node. Anything before it
+        # is removed instead, including the earlier siblings of its
+        # ancestors, as those elements may have been skipped by the tag
+        # filter. The element is then removed along with them once a later
+        # element is discarded.
+        elem.clear()
+        for e in chain([elem], elem.iterancestors()):
+            parent = e.getparent()
+            if parent is None:
+                break
+            while e.getprevious() is not None:
+                del parent[0]
+
+    def get_namespaces(self, elem):
+        parent = elem.getparent()
+        inherited = parent.nsmap if parent is not None else {}
+        return [
+            (prefix or "", uri)
+            for prefix, uri in elem.nsmap.items()
+            if inherited.get(prefix) != uri
+        ]
+
+    def iter_tag(self, elem, *local_names):
+        # lxml filters the tags itself, so only matching elements are returned
+        if not local_names:
+            return elem.iterdescendants(etree.Element)
+        return elem.iterdescendants(*_wildcard_tags(local_names))
+
+
+@lru_cache(maxsize=None)
+def _wildcard_tags(local_names):
+    # the tag filters for a set of names are built once and then reused
+    return tuple("{*}" + n for n in local_names)
+
+
+BACKENDS = {
+    LxmlBackend.name: LxmlBackend,
+    ElementTreeBackend.name: ElementTreeBackend,
+}
+
+
+def get_backend(name=None):
+    if name is None:
+        name = LxmlBackend.name if etree is not None else ElementTreeBackend.name
+    if name not in BACKENDS:
+        raise ValueError('Backend "{}" not recognised'.format(name))
+    if name == LxmlBackend.name and etree is None:
+        raise ImportError("lxml is not installed")
+    return BACKENDS[name]()
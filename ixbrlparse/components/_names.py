@@ -0,0 +1,14 @@
+import sys
+
+
+def split_name(name):
+    """
+    Split an item's name into its schema prefix and local name.
+
+    The same names are used by many items, so a single interned copy of
+    each is shared between them.
+    """
+    name = name.split(":", maxsplit=1)
+    if len(name) == 2:
+        return sys.intern(name[0]), sys.intern(name[1])
+    return "unknown", sys.intern(name[0])
@@ -3,6 +3,8 @@ from copy import deepcopy
 
 
 class ixbrlContext:
+    __slots__ = ("id", "entity", "segments", "instant", "startdate", "enddate")
+
     def __init__(self, _id, entity, segments, instant, startdate, enddate):
         self.id = _id
         self.entity = entity
@@ -35,7 +37,7 @@ class ixbrlContext:
         return "<IXBRLContext {} [{}]{}>".format(self.id, datestr, segmentstr)
 
     def to_json(self):
-        values = deepcopy(self.__dict__)
+        values = {k: deepcopy(getattr(self, k)) for k in self.__slots__}
         for i in ["startdate", "enddate", "instant"]:
             if isinstance(values[i], datetime.date):
                 values[i] = str(values[i])
@@ -1,22 +1,21 @@
 from copy import deepcopy
 
+from ._names import split_name
+
 
 class ixbrlNonNumeric:
+    __slots__ = ("schema", "name", "context", "format", "value")
+
     def __init__(self, context, name, format_, value):
 
-        name = name.split(":", maxsplit=1)
-        if len(name) == 2:
-            self.schema = name[0]
-            self.name = name[1]
-        else:
-            self.schema = "unknown"
-            self.name = name[0]
+        self.schema, self.name = split_name(name)
 
         self.context = context
         self.format = format_
         self.value = value
 
     def to_json(self):
-        values = deepcopy(self.__dict__)
-        values["context"] = self.context.to_json()
-        return values
+        return {
+            k: self.context.to_json() if k == "context" else deepcopy(getattr(self, k))
+            for k in self.__slots__
+        }
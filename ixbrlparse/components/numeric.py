@@ -1,9 +1,11 @@
 from copy import deepcopy
 
+from ._names import split_name
 from .transform import get_format, ixbrlFormat
 
 
 class ixbrlNumeric:
+    __slots__ = ("schema", "name", "text", "context", "unit", "format", "value")
 
     # contextref
     # decimals
@@ -15,25 +17,19 @@ class ixbrlNumeric:
     # unitref
     # xmlns:ix
     def __init__(self, attrs):
-        name = attrs.get("name", "").split(":", maxsplit=1)
-        if len(name) == 2:
-            self.schema = name[0]
-            self.name = name[1]
-        else:
-            self.schema = "unknown"
-            self.name = name[0]
+        self.schema, self.name = split_name(attrs.get("name", ""))
 
         self.text = attrs.get("value", attrs.get("text"))
         self.context = attrs.get("context")
         self.unit = attrs.get("unit")
 
-        format_ = {
-            "format_": attrs.get("format"),
-            "decimals": attrs.get("decimals", "0"),
-            "scale": attrs.get("scale", 0),
-            "sign": attrs.get("sign", ""),
-        }
-        self.format = get_format(format_["format_"])(**format_)
+        format_ = attrs.get("format")
+        self.format = get_format(format_)(
+            format_=format_,
+            decimals=attrs.get("decimals", "0"),
+            scale=attrs.get("scale", 0),
+            sign=attrs.get("sign", ""),
+        )
 
         try:
             self.value = self.format.parse_value(self.text)
@@ -42,8 +38,10 @@ class ixbrlNumeric:
             raise
 
     def to_json(self):
-        values = deepcopy(self.__dict__)
+        values = {
+            k: self.context.to_json() if k == "context" else deepcopy(getattr(self, k))
+            for k in self.__slots__
+        }
         if isinstance(values.get("format"), ixbrlFormat):
             values["format"] = values["format"].to_json()
-        values["context"] = self.context.to_json()
         return values
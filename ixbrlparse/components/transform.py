@@ -1,4 +1,5 @@
 from copy import deepcopy
+from functools import lru_cache
 
 
 class ixbrlFormat:
@@ -83,6 +84,8 @@ class ixtNumWordsEn(ixbrlFormat):
         return w2n.word_to_num(value)
 
 
+# documents use only a few formats, so each one is only looked up once
+@lru_cache(maxsize=None)
 def get_format(format_):
 
     original_format = format_
@@ -1,262 +1,370 @@
-from bs4 import BeautifulSoup
+import json
+from copy import deepcopy
 
+from ixbrlparse._backend import get_backend, get_text, localname
 from ixbrlparse.components import ixbrlContext, ixbrlNonNumeric, ixbrlNumeric
 
 FILETYPE_IXBRL = "ixbrl"
 FILETYPE_XBRL = "xbrl"
 
 
+def _clean_text(text):
+    return text.strip().replace("\n", "")
+
+
 class IXBRLParser:
+    filetype = FILETYPE_IXBRL
     root_element = "html"
+    element_handlers = {
+        "schemaRef": "_get_schema",
+        "context": "_get_context",
+        "unit": "_get_unit",
+        "nonNumeric": "_get_nonnumeric",
+        "nonFraction": "_get_numeric",
+    }
 
-    def __init__(self, soup, raise_on_error=True):
-        self.soup = soup
+    def __init__(self, backend, raise_on_error=True):
+        self.backend = backend
         self.raise_on_error = raise_on_error
+        self._handlers = {
+            name: getattr(self, method)
+            for name, method in self.element_handlers.items()
+        }
         self.errors = []
-
-    def _get_schema(self):
-        self.schema = self.soup.find(["link:schemaRef", "schemaRef"]).get("xlink:href")
+        self.schema = None
         self.namespaces = {}
-        for k in self.soup.find(self.root_element).attrs:
-            if k.startswith("xmlns") or ":" in k:
-                self.namespaces[k] = self.soup.find(self.root_element)[k].split(" ")
+        self.contexts = {}
+        self.units = {}
+        self.nonnumeric = []
+        self.numeric = []
 
-    def _get_context_elements(self):
-        resources = self.soup.find(["ix:resources", "resources"])
-        for s in resources.find_all(["xbrli:context", "context"]):
-            yield s
+    def _get_event_tags(self):
+        # the only elements that need to be seen while parsing, which lets the
+        # backend skip over everything else
+        return (self.root_element, *self.element_handlers)
 
-    def _get_contexts(self):
-        self.contexts = {}
-        for s in self._get_context_elements():
-            self.contexts[s["id"]] = ixbrlContext(
-                **{
-                    "_id": s["id"],
-                    "entity": {
-                        "scheme": s.find(["xbrli:identifier", "identifier"])[
-                            "scheme"
-                        ].strip()
-                        if s.find(["xbrli:identifier", "identifier"])
-                        else None,
-                        "identifier": s.find(
-                            ["xbrli:identifier", "identifier"]
-                        ).text.strip()
-                        if s.find(["xbrli:identifier", "identifier"])
-                        else None,
-                    },
-                    "segments": [
-                        {"tag": x.name, "value": x.text.strip(), **x.attrs}
-                        for x in s.find(["xbrli:segment", "segment"]).findChildren()
-                    ]
-                    if s.find(["xbrli:segment", "segment"])
-                    else None,
-                    "instant": s.find(["xbrli:instant", "instant"]).text.strip()
-                    if s.find(["xbrli:instant", "instant"])
-                    else None,
-                    "startdate": s.find(["xbrli:startDate", "startDate"]).text.strip()
-                    if s.find(["xbrli:startDate", "startDate"])
-                    else None,
-                    "enddate": s.find(["xbrli:endDate", "endDate"]).text.strip()
-                    if s.find(["xbrli:endDate", "endDate"])
-                    else None,
+    def _get_handler(self, elem):
+        # the method used to process the element once it has been fully parsed
+        return self._handlers.get(localname(elem.tag))
+
+    def _get_attrs(self, s):
+        # includes any namespaces declared on the element
+        attrs = self.backend.get_attrs(s)
+        declared = self.backend.get_namespaces(s)
+        if not declared:
+            return attrs
+        return {
+            **{
+                "xmlns:{}".format(prefix) if prefix else "xmlns": uri
+                for prefix, uri in declared
+            },
+            **attrs,
+        }
+
+    def _get_namespaces(self, s):
+        self.namespaces = {
+            "xmlns:{}".format(prefix) if prefix else "xmlns": uri.split(" ")
+            for prefix, uri in self.backend.get_namespaces(s)
+        }
+        for k, v in self.backend.get_attrs(s).items():
+            if ":" in k:
+                self.namespaces[k] = v.split(" ")
+
+    def _get_schema(self, s):
+        self.schema = self.backend.get_attrs(s).get("xlink:href")
+        # only the first schemaRef is used, so stop looking for any others
+        del self._handlers["schemaRef"]
+
+    def _get_context(self, s):
+        # find all the child elements in one pass through the context
+        _id = s.attrib["id"]
+        children = self.backend.find_each(
+            s, "identifier", "segment", "instant", "startDate", "endDate"
+        )
+        identifier = children.get("identifier")
+        segment = children.get("segment")
+        instant = children.get("instant")
+        startdate = children.get("startDate")
+        enddate = children.get("endDate")
+
+        self.contexts[_id] = ixbrlContext(
+            _id,
+            entity={
+                "scheme": identifier.attrib["scheme"].strip()
+                if identifier is not None
+                else None,
+                "identifier": get_text(identifier).strip()
+                if identifier is not None
+                else None,
+            },
+            segments=[
+                {
+                    "tag": localname(x.tag),
+                    "value": get_text(x).strip(),
+                    **self._get_attrs(x),
                 }
-            )
+                for x in self.backend.iter_tag(segment)
+            ]
+            if segment is not None
+            else None,
+            instant=get_text(instant).strip() if instant is not None else None,
+            startdate=get_text(startdate).strip() if startdate is not None else None,
+            enddate=get_text(enddate).strip() if enddate is not None else None,
+        )
 
-    def _get_unit_elements(self):
-        resources = self.soup.find(["ix:resources", "resources"])
-        for s in resources.find_all(["xbrli:unit", "unit"]):
-            yield s
+    def _get_unit(self, s):
+        measure = self.backend.find_first(s, "measure")
+        self.units[s.attrib["id"]] = (
+            get_text(measure).strip() if measure is not None else None
+        )
 
-    def _get_units(self):
-        self.units = {}
-        for s in self._get_unit_elements():
-            self.units[s["id"]] = (
-                s.find(["xbrli:measure", "measure"]).text.strip()
-                if s.find(["xbrli:measure", "measure"])
-                else None
+    def _get_nonnumeric(self, s):
+        attrs = self.backend.get_attrs(s)
+        element = {
+            "context": attrs["contextRef"],
+            "name": attrs["name"],
+            "format_": attrs.get("format"),
+            "value": _clean_text(get_text(s)),
+        }
+        try:
+            self.nonnumeric.append(ixbrlNonNumeric(**element))
+        except Exception as e:
+            self.errors.append(
+                {
+                    "error": e,
+                    # the element is cleared once it has been parsed
+                    "element": deepcopy(s),
+                }
             )
+            if self.raise_on_error:
+                raise
 
-    def _get_nonnumeric(self):
-        self.nonnumeric = []
-        for s in self.soup.find_all({"nonNumeric"}):
-            element = {
-                "context": self.contexts.get(s["contextRef"], s["contextRef"]),
-                "name": s["name"],
-                "format_": s.get("format"),
-                "value": s.text.strip().replace("\n", ""),
-            }
-            try:
-                self.nonnumeric.append(ixbrlNonNumeric(**element))
-            except Exception as e:
-                self.errors.append(
-                    {
-                        "error": e,
-                        "element": s,
-                    }
-                )
-                if self.raise_on_error:
-                    raise
+    def _get_numeric(self, s):
+        # the attributes are used as the element, rather than being copied
+        # into a new dict. Any attributes with the same names take priority.
+        element = self.backend.get_attrs(s)
+        element.setdefault("text", get_text(s))
+        element.setdefault("context", element["contextRef"])
+        element.setdefault("unit", element["unitRef"])
+        try:
+            self.numeric.append(ixbrlNumeric(element))
+        except Exception as e:
+            self.errors.append(
+                {
+                    "error": e,
+                    "element": deepcopy(s),
+                }
+            )
+            if self.raise_on_error:
+                raise
 
-    def _get_numeric(self):
-        self.numeric = []
-        for s in self.soup.find_all({"nonFraction"}):
-            element = {
-                "text": s.text,
-                "context": self.contexts.get(s["contextRef"], s["contextRef"]),
-                "unit": self.units.get(s["unitRef"], s["unitRef"]),
-                **s.attrs,
-            }
-            try:
-                self.numeric.append(ixbrlNumeric(element))
-            except Exception as e:
-                self.errors.append(
-                    {
-                        "error": e,
-                        "element": s,
-                    }
-                )
-                if self.raise_on_error:
-                    raise
+    def _resolve_references(self):
+        # contexts and units can appear after the values that refer to them,
+        # so they are only looked up once the whole document has been read
+        contexts = self.contexts
+        units = self.units
+        for n in self.nonnumeric:
+            n.context = contexts.get(n.context, n.context)
+        for n in self.numeric:
+            n.context = contexts.get(n.context, n.context)
+            n.unit = units.get(n.unit, n.unit)
 
 
 class XBRLParser(IXBRLParser):
+    filetype = FILETYPE_XBRL
     root_element = "xbrl"
+    element_handlers = {
+        "schemaRef": "_get_schema",
+        "context": "_get_context",
+        "unit": "_get_unit",
+    }
+
+    def _get_event_tags(self):
+        # facts are found from their attributes, so every element is needed
+        return None
 
-    def _get_context_elements(self):
-        for s in self.soup.find_all(["xbrli:context", "context"]):
-            yield s
+    def _get_handler(self, elem):
+        handler = super()._get_handler(elem)
+        if handler is None and elem.get("contextRef"):
+            if elem.get("unitRef"):
+                return self._get_numeric
+            return self._get_nonnumeric
+        return handler
 
-    def _get_unit_elements(self):
-        for s in self.soup.find_all(["xbrli:unit", "unit"]):
-            yield s
+    def _get_numeric(self, s):
+        element = self.backend.get_attrs(s)
+        element.setdefault("name", localname(s.tag))
+        element.setdefault("text", get_text(s))
+        element.setdefault("context", element["contextRef"])
+        element.setdefault("unit", element["unitRef"])
+        try:
+            self.numeric.append(ixbrlNumeric(element))
+        except Exception as e:
+            self.errors.append(
+                {
+                    "error": e,
+                    "element": deepcopy(s),
+                }
+            )
+            if self.raise_on_error:
+                raise
 
-    def _get_elements(self):
-        for s in self.soup.find(self.root_element).find_all():
-            yield s
+    def _get_nonnumeric(self, s):
+        attrs = self.backend.get_attrs(s)
+        element = {
+            "context": attrs["contextRef"],
+            "name": localname(s.tag),
+            "format_": attrs.get("format"),
+            "value": _clean_text(get_text(s)),
+        }
+        try:
+            self.nonnumeric.append(ixbrlNonNumeric(**element))
+        except Exception as e:
+            self.errors.append(
+                {
+                    "error": e,
+                    "element": deepcopy(s),
+                }
+            )
+            if self.raise_on_error:
+                raise
 
-    def _get_numeric(self):
-        self.numeric = []
-        for s in self._get_elements():
-            if not s.get("contextRef") or not s.get("unitRef"):
-                continue
-            element = {
-                "name": s.name,
-                "text": s.text,
-                "context": self.contexts.get(s["contextRef"], s["contextRef"]),
-                "unit": self.units.get(s["unitRef"], s["unitRef"]),
-                **s.attrs,
-            }
-            try:
-                self.numeric.append(ixbrlNumeric(element))
-            except Exception as e:
-                self.errors.append(
-                    {
-                        "error": e,
-                        "element": s,
-                    }
-                )
-                if self.raise_on_error:
-                    raise
 
-    def _get_nonnumeric(self):
-        self.nonnumeric = []
-        for s in self._get_elements():
-            if not s.get("contextRef") or s.get("unitRef"):
-                continue
-            element = {
-                "context": self.contexts.get(s["contextRef"], s["contextRef"]),
-                "name": s.name,
-                "format_": s.get("format"),
-                "value": s.text.strip().replace("\n", ""),
-            }
-            try:
-                self.nonnumeric.append(ixbrlNonNumeric(**element))
-            except Exception as e:
-                self.errors.append(
-                    {
-                        "error": e,
-                        "element": s,
-                    }
-                )
-                if self.raise_on_error:
-                    raise
+# the parser used for each type of document, found from its root element
+PARSERS = {parser.root_element: parser for parser in (IXBRLParser, XBRLParser)}
 
 
 class IXBRL:
-    def __init__(self, f, raise_on_error=True):
-        self.soup = BeautifulSoup(f.read(), "xml")
+    def __init__(self, f, raise_on_error=True, backend=None):
         self.raise_on_error = raise_on_error
-        self._get_parser()
-        self.parser._get_schema()
-        self.parser._get_contexts()
-        self.parser._get_units()
-        self.parser._get_nonnumeric()
-        self.parser._get_numeric()
+        self.backend = get_backend(backend)
+        self.parser = None
+        self._parse(f)
+        self.parser._resolve_references()
 
     @classmethod
-    def open(cls, filename, raise_on_error=True):
+    def open(cls, filename, raise_on_error=True, backend=None):
         with open(filename, "rb") as a:
-            return cls(a, raise_on_error=raise_on_error)
-
-    def _get_parser(self):
-        if self.soup.find("html"):
-            self.filetype = FILETYPE_IXBRL
-            parser = IXBRLParser
-        elif self.soup.find("xbrl"):
-            self.filetype = FILETYPE_XBRL
-            parser = XBRLParser
-        else:
+            return cls(a, raise_on_error=raise_on_error, backend=backend)
+
+    def _get_parser(self, name):
+        # no more of the document is read if it isn't a recognised type
+        parser = PARSERS.get(name)
+        if parser is None:
             raise Exception("Filetype not recognised")
-        self.parser = parser(self.soup, raise_on_error=self.raise_on_error)
+        self.filetype = parser.filetype
+        self.parser = parser(self.backend, raise_on_error=self.raise_on_error)
+
+    def _parse(self, f):
+        # The root element is read first to pick the parser, which tells the
+        # backend which elements it needs to see. Each element is routed to its
+        # handler once, when it is opened, and processed as soon as it is
+        # closed. Elements are then discarded so the whole document is never
+        # held in memory. `depth` counts the open elements that are still
+        # needed by an element being processed.
+        root, chunks = self.backend.read_root(f)
+        self._get_parser(root)
+
+        open_elements = []
+        depth = 0
+        for event, elem in self.backend.iterparse(
+            chunks, self.parser._get_event_tags()
+        ):
+            if event == "start":
+                handler = None
+                if not open_elements:
+                    self.parser._get_namespaces(elem)
+                else:
+                    handler = self.parser._get_handler(elem)
+                    if handler:
+                        depth += 1
+                open_elements.append((elem, handler))
+                continue
+
+            elem, handler = open_elements.pop()
+            if handler:
+                handler(elem)
+                depth -= 1
+            if depth == 0:
+                self.backend.discard(elem)
 
     def __getattr__(self, name):
         return getattr(self.parser, name)
 
     def to_json(self):
+        # a new copy is returned each time, so changes made to it don't affect
+        # the parsed data or later calls
         return {
             "schema": self.schema,
-            "namespaces": self.namespaces,
+            "namespaces": {k: list(v) for k, v in self.namespaces.items()},
             "contexts": {c: ct.to_json() for c, ct in self.contexts.items()},
-            "units": self.units,
+            "units": dict(self.units),
             "nonnumeric": [a.to_json() for a in self.nonnumeric],
             "numeric": [a.to_json() for a in self.numeric],
             "errors": len(self.errors),
         }
 
+    def to_json_bytes(self):
+        # orjson is much faster at serialising large documents, but is optional
+        try:
+            import orjson
+        except ImportError:
+            return json.dumps(self.to_json()).encode("utf-8")
+        return orjson.dumps(self.to_json())
+
     def to_table(self, fields="numeric"):
+        # each list of values is read in turn, rather than being joined into a
+        # new list, and only numeric values have a unit
         if fields == "nonnumeric":
-            values = self.nonnumeric
+            tables = [(self.nonnumeric, False)]
         elif fields == "numeric":
-            values = self.numeric
+            tables = [(self.numeric, True)]
         else:
-            values = self.nonnumeric + self.numeric
+            tables = [(self.nonnumeric, False), (self.numeric, True)]
 
+        # the date and segment columns are the same for every value that shares
+        # a context, so they are only worked out once for each context
+        context_columns = {}
+        # the schema column is also only worked out once for each schema
+        schema_columns = {}
         ret = []
-        for v in values:
-            if v.context.segments:
-                segments = {
-                    "segment:{}".format(i): "{} {} {}".format(
-                        s.get("tag", ""), s.get("dimension"), s.get("value")
-                    ).strip()
-                    for i, s in enumerate(v.context.segments)
-                }
-            else:
-                segments = {"segment:0": ""}
+        for values, has_unit in tables:
+            for v in values:
+                context = v.context
+                columns = context_columns.get(context)
+                if columns is None:
+                    columns = context_columns[context] = self._get_context_columns(
+                        context
+                    )
 
-            ret.append(
-                {
-                    "schema": " ".join(
+                schema = schema_columns.get(v.schema)
+                if schema is None:
+                    schema = schema_columns[v.schema] = " ".join(
                         self.namespaces.get("xmlns:{}".format(v.schema), [v.schema])
-                    ),
-                    "name": v.name,
-                    "value": v.value,
-                    "unit": v.unit if hasattr(v, "unit") else None,
-                    "instant": str(v.context.instant) if v.context.instant else None,
-                    "startdate": str(v.context.startdate)
-                    if v.context.startdate
-                    else None,
-                    "enddate": str(v.context.enddate) if v.context.enddate else None,
-                    **segments,
-                }
-            )
+                    )
+
+                ret.append(
+                    {
+                        "schema": schema,
+                        "name": v.name,
+                        "value": v.value,
+                        "unit": v.unit if has_unit else None,
+                        **columns,
+                    }
+                )
         return ret
+
+    def _get_context_columns(self, context):
+        columns = {
+            "instant": str(context.instant) if context.instant else None,
+            "startdate": str(context.startdate) if context.startdate else None,
+            "enddate": str(context.enddate) if context.enddate else None,
+        }
+        if context.segments:
+            for i, s in enumerate(context.segments):
+                columns["segment:{}".format(i)] = "{} {} {}".format(
+                    s.get("tag", ""), s.get("dimension"), s.get("value")
+                ).strip()
+        else:
+            columns["segment:0"] = ""
+        return columns
@@ -27,8 +27,10 @@ setup(
     ],
     python_requires=">=3.7",
     install_requires=[
-        "beautifulsoup4",
-        "lxml",
         "word2number",
     ],
+    extras_require={
+        # the standard library's ElementTree is used if lxml isn't installed
+        "lxml": ["lxml"],
+    },
 )
@@ -3,9 +3,9 @@ import json
 from datetime import date
 
 import pytest
-from bs4 import BeautifulSoup
 
 from ixbrlparse import IXBRL
+from ixbrlparse._backend import CHUNK_SIZE
 from ixbrlparse.core import ixbrlContext, ixbrlNonNumeric, ixbrlNumeric
 
 TEST_ACCOUNTS = [
@@ -35,11 +35,9 @@ def test_open():
     with open(TEST_ACCOUNTS[0]) as a:
         x = IXBRL(a)
         assert x.filetype == "ixbrl"
-        assert isinstance(x.soup, BeautifulSoup)
 
     x = IXBRL.open(TEST_ACCOUNTS[1])
     assert x.filetype == "ixbrl"
-    assert isinstance(x.soup, BeautifulSoup)
 
 
 def test_open_str():
@@ -47,18 +45,15 @@ def test_open_str():
         content = a.read()
         x = IXBRL(io.StringIO(content))
         assert x.filetype == "ixbrl"
-        assert isinstance(x.soup, BeautifulSoup)
 
 
 def test_open_xml():
     with open(TEST_XML_ACCOUNTS[0]) as a:
         x = IXBRL(a)
         assert x.filetype == "xbrl"
-        assert isinstance(x.soup, BeautifulSoup)
 
     x = IXBRL.open(TEST_XML_ACCOUNTS[0])
     assert x.filetype == "xbrl"
-    assert isinstance(x.soup, BeautifulSoup)
 
 
 def test_open_xml_str():
@@ -66,7 +61,6 @@ def test_open_xml_str():
         content = a.read()
         x = IXBRL(io.StringIO(content))
         assert x.filetype == "xbrl"
-        assert isinstance(x.soup, BeautifulSoup)
 
 
 @pytest.mark.parametrize(
@@ -328,8 +322,8 @@ def test_errors_raised():
 
     with open(TEST_ACCOUNTS[5]) as a:
         x = IXBRL(a, raise_on_error=False)
-        assert isinstance(x.soup, BeautifulSoup)
         assert len(x.errors) == 1
+        assert x.errors[0]["element"].tag.endswith("nonFraction")
 
 
 def test_errors_raised_open():
@@ -337,5 +331,154 @@ def test_errors_raised_open():
         IXBRL.open(TEST_ACCOUNTS[5])
 
     x = IXBRL.open(TEST_ACCOUNTS[5], raise_on_error=False)
-    assert isinstance(x.soup, BeautifulSoup)
     assert len(x.errors) == 1
+
+
+def test_contexts_after_values():
+    # contexts and units can be defined after the values that use them
+    content = """<xbrl xmlns="http://www.xbrl.org/2003/instance">
+        <CashBankInHand contextRef="e1" unitRef="GBP">12</CashBankInHand>
+        <EntityCurrentLegalName contextRef="e1">DEMO LIMITED</EntityCurrentLegalName>
+        <context id="e1"><period><instant>2020-12-31</instant></period></context>
+        <unit id="GBP"><measure>iso4217:GBP</measure></unit>
+    </xbrl>"""
+    x = IXBRL(io.StringIO(content))
+
+    assert x.numeric[0].context.instant == date(2020, 12, 31)
+    assert x.numeric[0].unit == "iso4217:GBP"
+    assert x.nonnumeric[0].context is x.contexts["e1"]
+
+
+@pytest.mark.parametrize("account", TEST_ACCOUNTS[0:5] + TEST_XML_ACCOUNTS)
+def test_etree_backend(account):
+    x = IXBRL.open(account, backend="etree")
+    assert x.to_json() == IXBRL.open(account, backend="lxml").to_json()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        IXBRL.open(TEST_ACCOUNTS[0], backend="blah")
+
+
+def test_without_lxml(monkeypatch):
+    monkeypatch.setattr("ixbrlparse._backend.etree", None)
+
+    x = IXBRL.open(TEST_ACCOUNTS[0])
+    assert x.backend.name == "etree"
+    assert len(x.numeric) > 0
+
+    with pytest.raises(ImportError):
+        IXBRL.open(TEST_ACCOUNTS[0], backend="lxml")
+
+
+class ChunkedReader(io.BytesIO):
+    # returns a few bytes from each read, so the document is parsed in many
+    # small chunks
+    def __init__(self, content, chunk_size):
+        super().__init__(content)
+        self.chunk_size = chunk_size
+
+    def read(self, size=-1):
+        return super().read(self.chunk_size)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 512])
+@pytest.mark.parametrize("backend", ["lxml", "etree"])
+@pytest.mark.parametrize("account", TEST_ACCOUNTS[0:5] + TEST_XML_ACCOUNTS)
+def test_chunked(account, backend, chunk_size):
+    with open(account, "rb") as a:
+        content = a.read()
+
+    x = IXBRL(ChunkedReader(content, chunk_size), backend=backend)
+    assert x.to_json() == IXBRL(io.BytesIO(content), backend=backend).to_json()
+
+
+@pytest.mark.parametrize("backend", ["lxml", "etree"])
+def test_chunk_boundary_after_fact(backend):
+    # the document is padded so that a read ends in the whitespace after a
+    # fact, while the parser is still adding text to the element's tail
+    with open(TEST_ACCOUNTS[1], "rb") as a:
+        content = a.read()
+    body = content.index(b"<body")
+    padding = b"<!--" + b"x" * (CHUNK_SIZE - 4851 - 8) + b"-->\n"
+    padded = content[:body] + padding + content[body:]
+
+    x = IXBRL(io.BytesIO(padded), backend=backend)
+    assert x.to_json() == IXBRL(io.BytesIO(content), backend=backend).to_json()
+
+
+def test_json_copy():
+    x = IXBRL.open(TEST_ACCOUNTS[0])
+    numeric_count = len(x.numeric)
+
+    j = x.to_json()
+    j["numeric"].clear()
+    j["units"].clear()
+    j["namespaces"].clear()
+
+    j = x.to_json()
+    assert len(j["numeric"]) == numeric_count
+    assert j["units"] == x.units
+    assert j["namespaces"] == x.namespaces
+
+
+def test_json_after_change():
+    x = IXBRL.open(TEST_ACCOUNTS[0])
+    x.to_json()
+    x.numeric[0].value = 999
+
+    assert x.to_json()["numeric"][0]["value"] == 999
+    assert json.loads(x.to_json_bytes())["numeric"][0]["value"] == 999
+
+
+def test_json_bytes():
+    x = IXBRL.open(TEST_ACCOUNTS[0])
+
+    assert json.loads(x.to_json_bytes()) == x.to_json()
+
+
+@pytest.mark.parametrize("backend", ["lxml", "etree"])
+def test_nonnumeric_whitespace(backend):
+    # whitespace between inline elements is part of the value
+    content = """<html xmlns="http://www.w3.org/1999/xhtml"
+        xmlns:ix="http://www.xbrl.org/2008/inlineXBRL"><body>
+        <ix:nonNumeric name="bus:Name" contextRef="c1"><span>JOAN</span> <span
+        >IMAGINARYNAME</span></ix:nonNumeric>
+    </body></html>"""
+    x = IXBRL(io.StringIO(content), backend=backend)
+
+    assert x.nonnumeric[0].value == "JOAN IMAGINARYNAME"
+
+
+def test_unrecognised_filetype():
+    with pytest.raises(Exception, match="Filetype not recognised"):
+        IXBRL(io.StringIO("<document><context id='a'/></document>"))
+
+
+@pytest.mark.parametrize("backend", ["lxml", "etree"])
+def test_text_declared_encoding(backend):
+    # text has already been decoded, so the declared encoding isn't used
+    content = """<?xml version="1.0" encoding="windows-1252"?>
+    <html xmlns="http://www.w3.org/1999/xhtml"
+        xmlns:ix="http://www.xbrl.org/2008/inlineXBRL"><body>
+        <ix:nonNumeric name="bus:Name" contextRef="c1">£100 – café</ix:nonNumeric>
+    </body></html>"""
+    x = IXBRL(io.StringIO(content), backend=backend)
+
+    assert x.nonnumeric[0].value == "£100 – café"
+
+
+@pytest.mark.parametrize("backend", ["lxml", "etree"])
+def test_first_schema(backend):
+    content = """<html xmlns="http://www.w3.org/1999/xhtml"
+        xmlns:ix="http://www.xbrl.org/2008/inlineXBRL"
+        xmlns:link="http://www.xbrl.org/2003/linkbase"
+        xmlns:xlink="http://www.w3.org/1999/xlink"><body>
+        <ix:references>
+            <link:schemaRef xlink:type="simple" xlink:href="first.xsd" />
+            <link:schemaRef xlink:type="simple" xlink:href="second.xsd" />
+        </ix:references>
+    </body></html>"""
+    x = IXBRL(io.StringIO(content), backend=backend)
+
+    assert x.schema == "first.xsd"